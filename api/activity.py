@@ -1,23 +1,28 @@
 """
 Manage user activities
 """
-from typing import Dict, Union, Optional, List
+from typing import Dict, Union, Optional, List, Tuple
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
 from dateutil import parser
-from mongoengine.errors import InvalidQueryError, LookUpError as LookUpErrorMongo
+from mongoengine import Q
+from mongoengine.errors import InvalidQueryError, ValidationError, LookUpError as LookUpErrorMongo
 
 from api.constants import *
 from db.models import Activity
 from logger import logger
 
+#  Mongo keeps datetimes as naive UTC milliseconds since the epoch
+_EPOCH = datetime(1970, 1, 1)
 
-def add_activity(activity: Dict, user: str) -> Union[int, None, str]:
+
+def _prepare_activity_data(activity: Dict) -> Optional[Dict]:
     """
-    Create new activity
-    :param user: activity's user reference in DB
+    Validate activity attributes and convert them to model values
     :param activity: an dict containing activity attributes
-    :return: Activity id if successful, None if failed, 0 if data is empty
+    :return: a dict with Activity fields, None if data is incomplete or malformed
     """
 
     ALL_FIELDS = [START_TIME_KEY, END_TIME_KEY, EXECUTABLE_KEY, BROWSER_TITLE_KEY, BROWSER_URL_KEY,
@@ -33,21 +38,47 @@ def add_activity(activity: Dict, user: str) -> Union[int, None, str]:
 
     for key, value in data.copy().items():
         if value is None and key in COMPULSORY_FIELDS:
-            return 0
+            return None
+
+    data[START_TIME_KEY] = parse_time(start_time)
+    data[END_TIME_KEY] = parse_time(end_time)
+    if data[START_TIME_KEY] is None or data[END_TIME_KEY] is None:
+        #  Can't recognise this datetime
+        return None
+
+    return data
 
+
+def parse_time(value: str) -> Optional[datetime]:
+    """
+    Parse a datetime sent by a client
+    :param value: a date string in any format dateutil understands or a timestamp in seconds,
+    longer timestamps are cut to seconds
+    :return: a datetime, None if the value is not recognised
+    """
     try:
-        data[START_TIME_KEY] = parser.parse(start_time)
-        data[END_TIME_KEY] = parser.parse(end_time)
+        return parser.parse(value)
     except Exception as e:
         #  Maybe timestamp
         try:
-            start_time = start_time[:10]
-            end_time = end_time[:10]
-            data[START_TIME_KEY] = datetime.fromtimestamp(int(start_time))
-            data[END_TIME_KEY] = datetime.fromtimestamp(int(end_time))
+            return datetime.fromtimestamp(int(value[:10]))
         except Exception as e:
-            #  Can't recognise this datetime
-            return 0
+            return None
+
+
+def add_activity(activity: Union[Dict, List[Dict]], user: str) -> Union[int, None, str, List[str]]:
+    """
+    Create new activity or multiple activities with a single bulk insert
+    :param user: activity's user reference in DB
+    :param activity: an dict containing activity attributes or a list of such dicts
+    :return: Activity id (a list of ids for a list) if successful, None if failed, 0 if data is empty
+    """
+    if isinstance(activity, list):
+        return _add_activities(activity, user)
+
+    data = _prepare_activity_data(activity)
+    if data is None:
+        return 0
 
     try:
         activity = Activity(user=user, **data)
@@ -59,6 +90,44 @@ def add_activity(activity: Dict, user: str) -> Union[int, None, str]:
     return None
 
 
+def _add_activities(activities: List[Dict], user: str) -> Union[int, None, List[str]]:
+    """
+    Create multiple activities with a single bulk insert, either all of them are stored or none
+    :param user: activities' user reference in DB
+    :param activities: a list of dicts containing activity attributes
+    :return: a list of Activity ids if successful, None if failed, 0 if any data is empty
+    """
+    if not activities:
+        return 0
+
+    documents = []
+    for activity in activities:
+        data = _prepare_activity_data(activity)
+        if data is None:
+            return 0
+        #  Ids are assigned upfront so a partially applied insert can be rolled back
+        document = Activity(id=ObjectId(), user=user, **data)
+        #  insert() skips the validation save() does, so check every document before writing any
+        try:
+            document.validate()
+        except ValidationError:
+            return 0
+        documents.append(document)
+
+    try:
+        Activity.objects.insert(documents, load_bulk=False)
+        return [str(document.id) for document in documents]
+    except Exception as e:
+        logger.exception(f'Failed to create Activities. Error: {e}')
+
+    try:
+        Activity.objects(id__in=[document.id for document in documents]).delete()
+    except Exception as e:
+        logger.exception(f'Failed to roll back Activities. Error: {e}')
+
+    return None
+
+
 def delete_activity(activity_id: str) -> Optional[int]:
     """
     Delete an activity
@@ -81,16 +150,19 @@ def delete_activity(activity_id: str) -> Optional[int]:
 
 def find_activities(user_ids: List[str], start_time: datetime = None, end_time: datetime = None,
                     items_to_return: int = 100, offset: int = 0,
-                    filters: Dict = {}) -> Union[int, None, List[Activity]]:
+                    filters: Dict = {}, cursor: Tuple[datetime, ObjectId] = None) -> Union[int, None, List[Dict]]:
     """
-    Find activities of users
+    Find activities of users, latest first
+    :param cursor: a start time and an id of the last activity seen as returned by decode_cursor,
+    only activities after it are returned and offset is ignored
     :param filters: a dict with filter for data
     :param offset: an amount of activities to skip
     :param items_to_return: an amount of activities to return
     :param end_time: a filter for start time of activities
     :param start_time: a filter for end time of activities
     :param user_ids: a list of user ids
-    :return: 1 if successful, None if failed, 0 if data is empty, -1 if request is bad
+    :return: a list of raw activity documents as stored if successful, None if failed, 0 if data is empty,
+    -1 if request is bad
     """
     if not user_ids:
         return 0
@@ -104,21 +176,66 @@ def find_activities(user_ids: List[str], start_time: datetime = None, end_time:
         params[f'{START_TIME_KEY}__gte'] = start_time
     if end_time:
         params[f'{END_TIME_KEY}__lt'] = end_time
+    #  Keyset pagination walks the (user, -start_time, -id) index instead of skipping documents,
+    #  the id breaks ties between activities started at the same time
+    after_cursor = Q()
+    if cursor:
+        cursor_start_time, cursor_id = cursor
+        after_cursor = Q(**{f'{START_TIME_KEY}__lt': cursor_start_time}) | \
+            Q(**{START_TIME_KEY: cursor_start_time, 'id__lt': cursor_id})
+        offset = 0
 
     try:
-        activities = Activity.objects(**params).skip(offset).limit(items_to_return)
-        if not activities:
-            return []
-        for activity in activities:
-            if activity[START_TIME_KEY] > activity[END_TIME_KEY]:
-                tmp = activity[START_TIME_KEY]
-                activity[START_TIME_KEY] = activity[END_TIME_KEY]
-                activity[END_TIME_KEY] = tmp
-
-        return activities
+        activities = Activity.objects(after_cursor, **params).order_by(f'-{START_TIME_KEY}', '-id')
+        return list(activities.skip(offset).limit(items_to_return).as_pymongo())
     except InvalidQueryError:
         return -1
     except (Exception, InvalidQueryError, LookUpErrorMongo) as e:
         logger.exception(f'Failed to fetch Activities. Error: {e}')
         return None
 
+
+def encode_cursor(activity: Dict) -> str:
+    """
+    Make a pagination cursor pointing after an activity
+    :param activity: a raw activity document as returned by find_activities
+    :return: an opaque cursor string
+    """
+    start_time = activity[START_TIME_KEY]
+    milliseconds = (start_time - _EPOCH) // timedelta(milliseconds=1)
+    return f'{milliseconds}_{activity["_id"]}'
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, ObjectId]]:
+    """
+    Read a pagination cursor made by encode_cursor
+    :param cursor: a cursor string
+    :return: a start time and an id of the activity, None if the cursor is malformed
+    """
+    try:
+        milliseconds, activity_id = cursor.split('_')
+        return _EPOCH + timedelta(milliseconds=int(milliseconds)), ObjectId(activity_id)
+    except (ValueError, OverflowError, InvalidId, TypeError):
+        return None
+
+
+def build_activities_page(activities: List[Dict], items_to_return: int) -> Dict:
+    """
+    Prepare activities returned by find_activities for a response
+    :param activities: a list of raw activity documents, latest first, fetched with one more item than requested
+    to tell whether a next page exists
+    :param items_to_return: an amount of activities requested
+    :return: a dict with activities and a cursor for the next page, None if there are no more activities
+    """
+    next_cursor = None
+    if len(activities) > items_to_return:
+        activities = activities[:items_to_return]
+        #  The cursor holds the stored start time, so take it before inverted times are fixed
+        next_cursor = encode_cursor(activities[-1])
+    for activity in activities:
+        if activity[START_TIME_KEY] > activity[END_TIME_KEY]:
+            tmp = activity[START_TIME_KEY]
+            activity[START_TIME_KEY] = activity[END_TIME_KEY]
+            activity[END_TIME_KEY] = tmp
+
+    return {ACTIVITIES_KEY: activities, NEXT_CURSOR_KEY: next_cursor}
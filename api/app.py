@@ -1,29 +1,41 @@
 """
 API interface for Innometrics backend
 """
-import datetime
-import json
+if __name__ == '__main__':
+    #  Started as the gevent server: make sockets, locks and sleeps cooperative before any import opens them.
+    #  Importers stay unpatched and gunicorn's gevent worker patches on its own.
+    from gevent import monkey
+    monkey.patch_all()
+
+import base64
+import binascii
+import collections
+import hashlib
+import hmac
+import threading
+import time
 from http import HTTPStatus
-from typing import Optional
+from typing import Optional, Union, Dict
 
 import bcrypt
+import cachetools
 import flask
-import jwt
-from apispec.ext.flask import FlaskPlugin
-from apispec.ext.marshmallow import MarshmallowPlugin
-from flask import Flask, make_response, jsonify, Blueprint
+import orjson
+from flask import Flask, Blueprint
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_cors import CORS
-from apispec import APISpec
+from gevent.pool import Pool
 from gevent.pywsgi import *
+from gevent.threadpool import ThreadPool
 
-from api.activity import add_activity, delete_activity, find_activities
+from api.activity import add_activity, delete_activity, find_activities, build_activities_page
 from api.constants import *
 from api.project import create_new_project, invite_user, accept_invitation, get_project_activities
-from api.conf import CORS_URL
+from api.schemas import ActivityQuerySchema
+from api.conf import CORS_URL, BCRYPT_COST, VERIFY_PASSWORD_CACHE, SERVER_MAX_CONNECTIONS, SERVER_BACKLOG
 from db.models import User
 from logger import logger
-from utils import execute_function_in_parallel
+from utils import normalize_email
 
 import os
 
@@ -32,30 +44,96 @@ CORS(app, supports_credentials=True, origins=[CORS_URL])
 
 bp = Blueprint("routes", __name__)
 
-app.secret_key = os.environ['FLASK_SECRET_KEY']
+_SECRET = os.environ['FLASK_SECRET_KEY']
+_SECRET_BYTES = _SECRET.encode()
+#  Keyed once, copies skip hashing the key pads for every token
+_TOKEN_HMAC = hmac.new(_SECRET_BYTES, digestmod=hashlib.sha256)
+_TOKEN_TTL = 30 * 24 * 60 * 60
+
+app.secret_key = _SECRET
 
 login_manager = LoginManager()
 login_manager.init_app(app)
 
-spec = APISpec(
-    title='Innometrics backend API',
-    version='1.0.0',
-    plugins=(
-        FlaskPlugin(),
-        MarshmallowPlugin(),
-    ),
-    consumes=['multipart/form-data', 'application/x-www-form-urlencoded']
-)
+#  Users resolved from auth tokens, keyed by a SHA-256 of the token. The TTL bounds how long
+#  a revoked token or a deleted user can still be served from the cache.
+_token_cache = cachetools.TTLCache(maxsize=10000, ttl=30)
+_invalid_token_cache = cachetools.TTLCache(maxsize=10000, ttl=5)
+_token_cache_lock = threading.Lock()
+
+#  bcrypt releases the GIL, so hashing on a pool of real OS threads runs in parallel across cores
+#  while the waiting greenlet yields to other requests. Patched threading would only give greenlets.
+_bcrypt_pool = ThreadPool(os.cpu_count() or 1)
+
+#  Successful password checks keyed by a SHA-256 of the password and its hash, failures are never cached
+_verify_password_cache = cachetools.TTLCache(maxsize=4096, ttl=300)
+_verify_password_cache_lock = threading.Lock()
+
+_activity_query_schema = ActivityQuerySchema()
+
+#  Salts are cut from one large urandom read instead of a syscall per hash
+_SALT_SIZE = 16
+_SALT_POOL_SIZE = 1024
+_BCRYPT_B64_TABLE = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/',
+                                    b'./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789')
+_salt_pool = collections.deque()
+_salt_pool_pid = None
+_salt_pool_lock = threading.Lock()
+
+#  Version of the bcrypt input scheme stored with new password hashes, see _prepare_password
+PASSWORD_HASH_VERSION = 2
+
+
+def _get_data():
+    """
+    Get request body parameters, sent either as JSON or as a form
+    :return: a dict with parsed JSON or request form
+    """
+    return flask.request.get_json(silent=True) or flask.request.form
+
+
+def _json(payload, status: int = HTTPStatus.OK) -> flask.Response:
+    """
+    Build a JSON response with orjson
+    :param payload: a JSON serializable object, unknown types and datetimes are converted with str
+    :param status: an HTTP status of the response
+    :return: Response with JSON mimetype
+    """
+    return flask.Response(orjson.dumps(payload, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME),
+                          status=status, mimetype='application/json')
 
 
 @login_manager.user_loader
 def load_user(user_id) -> Optional[User]:
     """
-    Load a user from DB
+    Load a user from DB, only the id is fetched as routes use current_user as a reference
     :param user_id: an id of the user
     :return: User instance or None if not found
     """
-    return User.objects(id=user_id).first()
+    return User.objects(id=user_id).only('id').first()
+
+
+def _b64url_encode(data: bytes) -> bytes:
+    """
+    Encode data as unpadded base64url used in JWT segments
+    :param data: bytes to encode
+    :return: base64url encoded bytes
+    """
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+_JWT_HEADER_B64 = _b64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+
+
+def _sign(signing_input: bytes) -> bytes:
+    """
+    Compute HMAC-SHA256 signature of a token
+    :param signing_input: token header and payload segments
+    :return: signature bytes
+    """
+    token_hmac = _TOKEN_HMAC.copy()
+    token_hmac.update(signing_input)
+    return token_hmac.digest()
 
 
 def encode_auth_token(user_id) -> Optional[bytes]:
@@ -64,71 +142,207 @@ def encode_auth_token(user_id) -> Optional[bytes]:
     :return: string
     """
     try:
+        now = int(time.time())
         payload = {
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30),
-            'iat': datetime.datetime.utcnow(),
+            'exp': now + _TOKEN_TTL,
+            'iat': now,
             'sub': user_id
         }
-        return jwt.encode(
-            payload,
-            os.environ['FLASK_SECRET_KEY'],
-            algorithm='HS256'
-        )
+        signing_input = _JWT_HEADER_B64 + b'.' + _b64url_encode(orjson.dumps(payload))
+        signature = _sign(signing_input)
+        return signing_input + b'.' + _b64url_encode(signature)
     except Exception as e:
         logger.exception(f'Failed to encode token. Error {e}')
         return None
 
 
-def decode_auth_token(auth_token) -> Optional[str]:
+def _b64url_decode(data: bytes) -> bytes:
     """
-    Decodes the auth token
-    :param auth_token:
-    :return: integer|string
+    Decode unpadded base64url data used in JWT segments
+    :param data: base64url encoded bytes
+    :return: decoded bytes
+    """
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+def _secure_eq(a: bytes, b: bytes) -> bool:
+    """
+    Compare secrets in constant time
+    :param a: a first value
+    :param b: a second value
+    :return: True if they are same, False otherwise
+    """
+    return hmac.compare_digest(a, b)
+
+
+def _decode_auth_payload(auth_token) -> Optional[Dict]:
+    """
+    Verify the auth token and decode its claims
+    :param auth_token: an auth token
+    :return: token claims or None if the token is invalid or expired
     """
     try:
-        payload = jwt.decode(auth_token, os.environ['FLASK_SECRET_KEY'])
-        return payload['sub']
-    except jwt.ExpiredSignatureError:
-        #  Signature expired. Please log in again.
-        return None
-    except jwt.InvalidTokenError:
+        signing_input, _, signature = auth_token.encode().rpartition(b'.')
+        _, payload_segment = signing_input.split(b'.')
+        expected_signature = _sign(signing_input)
+        if not _secure_eq(expected_signature, _b64url_decode(signature)):
+            #  Invalid token. Please log in again.
+            return None
+        payload = orjson.loads(_b64url_decode(payload_segment))
+        if payload['exp'] < time.time():
+            #  Signature expired. Please log in again.
+            return None
+        return payload
+    except (ValueError, KeyError, TypeError, binascii.Error):
         #  Invalid token. Please log in again.
         return None
 
 
+def _get_request_token(request) -> str:
+    """
+    Extract an auth token from the request headers
+    :param request: a request to extract the token from
+    :return: the token or an empty string if not provided or the header is malformed
+    """
+    header = request.headers.get('Authorization')
+    if not header or not header.startswith(AUTH_TOKEN_PREFIX):
+        return ''
+    return header[len(AUTH_TOKEN_PREFIX):]
+
+
+def _token_cache_key(token: str) -> bytes:
+    """
+    Build a cache key for the token so raw tokens are never kept in memory
+    :param token: an auth token
+    :return: SHA-256 digest of the token
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _evict_token(token: str) -> None:
+    """
+    Remove a token from the auth caches
+    :param token: an auth token
+    """
+    if not token:
+        return
+    key = _token_cache_key(token)
+    with _token_cache_lock:
+        _token_cache.pop(key, None)
+        _invalid_token_cache.pop(key, None)
+
+
 @login_manager.request_loader
 def load_user_from_request(request) -> Optional[User]:
-    token = request.headers.get('Authorization', default='').replace('Token ', '')
+    token = _get_request_token(request)
     if not token:
         return None
 
-    user_id = decode_auth_token(token)
-
-    if user_id:
-        return load_user(user_id)
-    else:
+    key = _token_cache_key(token)
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+        invalid = key in _invalid_token_cache
+    if cached is not None:
+        user, expires_at = cached
+        #  The cache TTL must not outlive the token itself
+        if expires_at >= time.time():
+            return user
+        _evict_token(token)
         return None
+    if invalid:
+        return None
+
+    payload = _decode_auth_payload(token)
+    user_id = payload.get('sub') if payload else None
+    user = load_user(user_id) if user_id else None
+
+    with _token_cache_lock:
+        if user is not None:
+            _token_cache[key] = (user, payload['exp'])
+        else:
+            _invalid_token_cache[key] = True
+    return user
+
+
+def _gensalt() -> bytes:
+    """
+    Generate a bcrypt salt with the configured cost, same as bcrypt.gensalt
+    :return: salt in $2b$<cost>$<22 chars of bcrypt base64> format
+    """
+    global _salt_pool_pid
+    with _salt_pool_lock:
+        #  A forked worker must not reuse salts its parent already read
+        if not _salt_pool or _salt_pool_pid != os.getpid():
+            entropy = os.urandom(_SALT_SIZE * _SALT_POOL_SIZE)
+            _salt_pool.clear()
+            _salt_pool.extend(entropy[i:i + _SALT_SIZE] for i in range(0, len(entropy), _SALT_SIZE))
+            _salt_pool_pid = os.getpid()
+        salt = _salt_pool.popleft()
+    return b'$2b$%02d$' % BCRYPT_COST + base64.b64encode(salt).translate(_BCRYPT_B64_TABLE)[:22]
+
+
+def _prepare_password(password: str, version: int = PASSWORD_HASH_VERSION) -> bytes:
+    """
+    Convert a password to the bcrypt input of the given hash version
+    :param password: a password
+    :param version: 1 - raw password, 2 - hex encoded SHA-256 of the password, which avoids bcrypt
+    truncating inputs at 72 bytes and stopping at NUL bytes
+    :return: bytes to pass to bcrypt
+    """
+    if version >= 2:
+        return binascii.hexlify(hashlib.sha256(password.encode()).digest())
+    return password.encode()
 
 
-def _hash_password(password: str) -> str:
+def _hash_password(password: str) -> bytes:
     """
-    Hash a password
+    Hash a password with the current hash version
     :param password: a password
     :return: hashed password
     """
 
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return _bcrypt_pool.apply(bcrypt.hashpw, (_prepare_password(password), _gensalt()))
 
 
-def _check_password(plain_pass: str, encoded_pass: str) -> bool:
+def _check_password(plain_pass: str, encoded_pass: Union[bytes, str], version: int) -> bool:
     """
     Check if two passwords are the same
     :param plain_pass: a first unhashed password
-    :param encoded_pass: a hashed password to check with
+    :param encoded_pass: a hashed password to check with, str for users stored before it became binary
+    :param version: a hash version of encoded_pass
     :return: True if they are same, False otherwise
     """
+    if isinstance(encoded_pass, str):
+        encoded_pass = encoded_pass.encode()
+    plain_pass = _prepare_password(plain_pass, version)
 
-    return bcrypt.checkpw(plain_pass.encode(), encoded_pass.encode())
+    if not VERIFY_PASSWORD_CACHE:
+        return _bcrypt_pool.apply(bcrypt.checkpw, (plain_pass, encoded_pass))
+
+    key = hashlib.sha256(plain_pass + b'|' + encoded_pass).digest()
+    with _verify_password_cache_lock:
+        if key in _verify_password_cache:
+            return True
+
+    result = _bcrypt_pool.apply(bcrypt.checkpw, (plain_pass, encoded_pass))
+    if result:
+        with _verify_password_cache_lock:
+            _verify_password_cache[key] = True
+    return result
+
+
+def _needs_rehash(encoded_pass: Union[bytes, str]) -> bool:
+    """
+    Check if a password hash was created with a lower cost than the configured one
+    :param encoded_pass: a hashed password, formatted as $2b$<cost>$<salt and hash>
+    :return: True if the password should be hashed again
+    """
+    if isinstance(encoded_pass, str):
+        encoded_pass = encoded_pass.encode()
+    try:
+        return int(encoded_pass.split(b'$')[2]) < BCRYPT_COST
+    except (IndexError, ValueError):
+        return False
 
 
 @bp.route('/login', methods=['GET', 'POST'])
@@ -161,29 +375,40 @@ def login():
                 description: User was logged in
     """
     try:
-        data = flask.request.json if flask.request.json else flask.request.form
+        data = _get_data()
         email: str = data.get(EMAIL_KEY)
         password: str = data.get(PASSWORD_KEY)
 
         if not (email and password):
-            return make_response(jsonify({MESSAGE_KEY: 'Not enough data provided'}), HTTPStatus.BAD_REQUEST)
+            return _json({MESSAGE_KEY: 'Not enough data provided'}, HTTPStatus.BAD_REQUEST)
 
-        existing_user = User.objects(email=email.lower()).first()
-        existing_user = existing_user if existing_user else User.objects(email=email).first()
+        email = normalize_email(email)
+        existing_user = User.objects(email=email).only('id', 'password', 'password_hash_version',
+                                                       'name', 'surname').first()
         if not existing_user:
-            return make_response(jsonify({MESSAGE_KEY: 'User not found'}), HTTPStatus.NOT_FOUND)
-        if _check_password(password, existing_user.password):
+            return _json({MESSAGE_KEY: 'User not found'}, HTTPStatus.NOT_FOUND)
+        #  Projected fields missing in legacy documents are not filled with the model default
+        hash_version = existing_user.password_hash_version or 1
+        if _check_password(password, existing_user.password, hash_version):
+            if _needs_rehash(existing_user.password) or hash_version < PASSWORD_HASH_VERSION:
+                #  The plain password is only known here, upgrade the hash to the current cost and version.
+                #  The old hash stays valid, so a failed upgrade must not block the login.
+                try:
+                    existing_user.update(password=_hash_password(password),
+                                         password_hash_version=PASSWORD_HASH_VERSION)
+                except Exception as e:
+                    logger.exception(f'Failed to upgrade password hash. Error: {e}')
             login_user(existing_user)
-            return make_response(jsonify({NAME_KEY: str(existing_user.name),
-                                          SURNAME_KEY: str(existing_user.surname),
-                                          MESSAGE_KEY: 'Success',
-                                          TOKEN_KEY: encode_auth_token(str(existing_user.id)).decode()
-                                          }),
-                                          HTTPStatus.OK)
-        return make_response(jsonify({MESSAGE_KEY: 'Failed to authenticate'}), HTTPStatus.UNAUTHORIZED)
+            return _json({NAME_KEY: str(existing_user.name),
+                          SURNAME_KEY: str(existing_user.surname),
+                          MESSAGE_KEY: 'Success',
+                          TOKEN_KEY: encode_auth_token(str(existing_user.id)).decode()
+                          },
+                         HTTPStatus.OK)
+        return _json({MESSAGE_KEY: 'Failed to authenticate'}, HTTPStatus.UNAUTHORIZED)
     except Exception as e:
         logger.exception(f'Failed to login user. Error {e}')
-        return make_response(jsonify({MESSAGE_KEY: 'Something bad happened'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Something bad happened'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 @bp.route('/user', methods=['POST'])
@@ -224,30 +449,30 @@ def user_register():
                 description: User was logged registered
     """
     try:
-        data = flask.request.json if flask.request.json else flask.request.form
+        data = _get_data()
         email: str = data.get(EMAIL_KEY)
         password: str = data.get(PASSWORD_KEY)
         name: str = data.get(NAME_KEY)
         surname: str = data.get(SURNAME_KEY)
 
         if not (email and password and name and surname):
-            return make_response(jsonify({MESSAGE_KEY: 'Not enough data provided'}), HTTPStatus.BAD_REQUEST)
+            return _json({MESSAGE_KEY: 'Not enough data provided'}, HTTPStatus.BAD_REQUEST)
 
-        existing_user = User.objects(email=email).first()
-        existing_user = existing_user if existing_user else User.objects(email=email.lower()).first()
-        email = email.lower()
+        email = normalize_email(email)
+        existing_user = User.objects(email=email).only('id').first()
         if existing_user:
-            return make_response(jsonify({MESSAGE_KEY: 'User already exists'}), HTTPStatus.CONFLICT)
+            return _json({MESSAGE_KEY: 'User already exists'}, HTTPStatus.CONFLICT)
 
-        user = User(email=email, password=_hash_password(password), name=name, surname=surname)
+        user = User(email=email, password=_hash_password(password), password_hash_version=PASSWORD_HASH_VERSION,
+                    name=name, surname=surname)
         if not user:
-            return make_response(jsonify({MESSAGE_KEY: 'Failed to create user'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+            return _json({MESSAGE_KEY: 'Failed to create user'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
         user.save()
-        return make_response(jsonify({MESSAGE_KEY: 'Success'}), HTTPStatus.OK)
+        return _json({MESSAGE_KEY: 'Success'}, HTTPStatus.OK)
     except Exception as e:
         logger.exception(f'Failed to register user. Error {e}')
-        return make_response(jsonify({MESSAGE_KEY: 'Something bad happened'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Something bad happened'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 @bp.route('/project', methods=['POST'])
@@ -272,20 +497,20 @@ def new_project():
                 description: Project was created
     """
     try:
-        data = flask.request.json if flask.request.json else flask.request.form
+        data = _get_data()
         name: str = data.get(NAME_KEY)
 
         if not name:
-            return make_response(jsonify({MESSAGE_KEY: 'Not enough data provided'}), HTTPStatus.BAD_REQUEST)
+            return _json({MESSAGE_KEY: 'Not enough data provided'}, HTTPStatus.BAD_REQUEST)
 
         project = create_new_project(name, current_user.to_dbref())
         if not project:
-            return make_response(jsonify({MESSAGE_KEY: 'Failed to create project'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+            return _json({MESSAGE_KEY: 'Failed to create project'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
-        return make_response(jsonify({MESSAGE_KEY: 'Success', PROJECT_KEY: project}), HTTPStatus.CREATED)
+        return _json({MESSAGE_KEY: 'Success', PROJECT_KEY: project}, HTTPStatus.CREATED)
     except Exception as e:
         logger.exception(f'Failed to register user. Error {e}')
-        return make_response(jsonify({MESSAGE_KEY: 'Something bad happened'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Something bad happened'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 @bp.route('/project/<string:project_id>/invite', methods=['POST'])
@@ -320,23 +545,22 @@ def invite(project_id: str):
                 description: User was invited
     """
     try:
-        data = flask.request.json if flask.request.json else flask.request.form
+        data = _get_data()
         user_email: str = data.get(USER_EMAIL_KEY)
         manager: bool = True if data.get(MANAGER_KEY, 'False') == 'True' else False
 
         if not (project_id and user_email):
-            return make_response(jsonify({MESSAGE_KEY: 'Not enough data provided'}), HTTPStatus.BAD_REQUEST)
+            return _json({MESSAGE_KEY: 'Not enough data provided'}, HTTPStatus.BAD_REQUEST)
 
         result = invite_user(project_id=project_id, user_email=user_email, invitor=current_user.to_dbref(),
                              manager=manager)
         if not result:
-            return make_response(jsonify({MESSAGE_KEY: 'Failed to send the invitation'}),
-                                 HTTPStatus.INTERNAL_SERVER_ERROR)
+            return _json({MESSAGE_KEY: 'Failed to send the invitation'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
-        return make_response(jsonify({MESSAGE_KEY: 'Success'}), HTTPStatus.OK)
+        return _json({MESSAGE_KEY: 'Success'}, HTTPStatus.OK)
     except Exception as e:
         logger.exception(f'Failed to register user. Error {e}')
-        return make_response(jsonify({MESSAGE_KEY: 'Something bad happened'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Something bad happened'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 @bp.route('/project/<string:project_id>/accept_invitation', methods=['POST'])
@@ -362,16 +586,16 @@ def accept_invitation_endpoint(project_id: str):
     """
     try:
         if not project_id:
-            return make_response(jsonify({MESSAGE_KEY: 'Not enough data provided'}), HTTPStatus.BAD_REQUEST)
+            return _json({MESSAGE_KEY: 'Not enough data provided'}, HTTPStatus.BAD_REQUEST)
 
         result = accept_invitation(project_id=project_id, user=current_user.to_dbref())
         if not result:
-            return make_response(jsonify({MESSAGE_KEY: 'Failed to accept'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+            return _json({MESSAGE_KEY: 'Failed to accept'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
-        return make_response(jsonify({MESSAGE_KEY: 'Success'}), HTTPStatus.OK)
+        return _json({MESSAGE_KEY: 'Success'}, HTTPStatus.OK)
     except Exception as e:
         logger.exception(f'Failed to register user. Error {e}')
-        return make_response(jsonify({MESSAGE_KEY: 'Something bad happened'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Something bad happened'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 @bp.route('/project/<string:project_id>/activity', methods=['GET'])
@@ -414,43 +638,44 @@ def project_activities(project_id: str):
                 required: false
                 type: string
                 description: maximum end time of an activity
+            -   name: cursor
+                in: query
+                required: false
+                type: string
+                description: next_cursor of the previous page, used instead of offset
         responses:
             404:
                 description: Activities were not found
             400:
                 description: Wrong format
             200:
-                description: A list of activities was returned
-    """
-    data = flask.request.args
-    offset: int = int(data.get(OFFSET_KEY, 0))
-    amount_to_return: int = min(int(data.get(AMOUNT_TO_RETURN_KEY, 100)), 10000)
-    filters = data.get(FILTERS_KEY, {})
-    start_time = data.get(START_TIME_KEY, None)
-    end_time = data.get(END_TIME_KEY, None)
-
-    if not isinstance(filters, dict):
-        try:
-            filters = json.loads(filters)
-        except Exception:
-            return make_response(jsonify({MESSAGE_KEY: 'Wrong format'}), HTTPStatus.BAD_REQUEST)
-
+                description: A list of activities was returned, latest first, with next_cursor
+    """
+    args, errors = _activity_query_schema.load(flask.request.args)
+    if errors:
+        return _json({MESSAGE_KEY: 'Wrong format'}, HTTPStatus.BAD_REQUEST)
+    offset: int = args[OFFSET_KEY]
+    amount_to_return: int = min(args[AMOUNT_TO_RETURN_KEY], 10000)
+    filters = args[FILTERS_KEY]
+    start_time = args[START_TIME_KEY]
+    end_time = args[END_TIME_KEY]
+    cursor = args[CURSOR_KEY]
+
+    #  One extra activity tells build_activities_page whether there is a next page
     activities = get_project_activities(project_id=project_id,
-                                        user=current_user.to_dbref(), offset=offset, items_to_return=amount_to_return,
-                                        filters=filters, start_time=start_time, end_time=end_time)
+                                        user=current_user.to_dbref(), offset=offset,
+                                        items_to_return=amount_to_return + 1,
+                                        filters=filters, start_time=start_time, end_time=end_time,
+                                        cursor=cursor)
     if activities is None:
-        return make_response(jsonify({MESSAGE_KEY: 'Failed to fetch activities'}),
-                             HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Failed to fetch activities'}, HTTPStatus.INTERNAL_SERVER_ERROR)
     if activities == -1:
-        return make_response(jsonify({MESSAGE_KEY: 'Wrong format for filters'}),
-                             HTTPStatus.BAD_REQUEST)
+        return _json({MESSAGE_KEY: 'Wrong format for filters'}, HTTPStatus.BAD_REQUEST)
 
     if not activities:
-        return make_response(jsonify({MESSAGE_KEY: 'Activities of current user were not found'}),
-                             HTTPStatus.NOT_FOUND)
-    activities_list = [{k: str(v) for k, v in activity.to_mongo().items()} for activity in activities]
+        return _json({MESSAGE_KEY: 'Activities of current user were not found'}, HTTPStatus.NOT_FOUND)
 
-    return make_response(jsonify({MESSAGE_KEY: 'Success', ACTIVITIES_KEY: activities_list}), HTTPStatus.OK)
+    return _json({MESSAGE_KEY: 'Success', **build_activities_page(activities, amount_to_return)}, HTTPStatus.OK)
 
 
 @bp.route('/user', methods=['DELETE'])
@@ -468,11 +693,12 @@ def user_delete():
     """
     try:
         current_user.delete()
+        _evict_token(_get_request_token(flask.request))
     except Exception as e:
         logger.exception(f'Failed to delete user. Error {e}')
-        return make_response(jsonify({MESSAGE_KEY: 'Failed to delete user'}), HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Failed to delete user'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
-    return make_response(jsonify({MESSAGE_KEY: 'Success'}), HTTPStatus.OK)
+    return _json({MESSAGE_KEY: 'Success'}, HTTPStatus.OK)
 
 
 @bp.route("/logout", methods=['POST'])
@@ -490,9 +716,10 @@ def logout():
     """
     try:
         logout_user()
+        _evict_token(_get_request_token(flask.request))
     except Exception as e:
         logger.exception(f'Failed to log out user. Error {e}')
-    return make_response(jsonify({MESSAGE_KEY: 'Success'}), HTTPStatus.OK)
+    return _json({MESSAGE_KEY: 'Success'}, HTTPStatus.OK)
 
 
 @bp.route('/activity', methods=['POST'])
@@ -568,37 +795,24 @@ def activity_add():
             201:
                 description: Activity was added
     """
-    data = flask.request.json if flask.request.json else flask.request.form
+    data = _get_data()
     activity_data = data.get(ACTIVITY_KEY)
     if not isinstance(activity_data, dict):
         try:
-            activity_data = json.loads(activity_data)
+            activity_data = orjson.loads(activity_data)
         except Exception:
-            return make_response(jsonify({MESSAGE_KEY: 'Wrong format'}), HTTPStatus.BAD_REQUEST)
+            return _json({MESSAGE_KEY: 'Wrong format'}, HTTPStatus.BAD_REQUEST)
 
     if ACTIVITIES_KEY in activity_data:
         #  Add multiple activities
-        activities = [(activity, current_user.to_dbref()) for activity in activity_data.get(ACTIVITIES_KEY, [])]
-        all_result = execute_function_in_parallel(add_activity, activities)
-        result = 1
-        for part_result in all_result:
-            if not part_result:
-                result = part_result
-        if result:
-            result = all_result
-        else:
-            # Delete those activities that were added
-            for part_result in all_result:
-                if part_result:
-                    delete_activity(part_result)
+        result = add_activity(activity_data.get(ACTIVITIES_KEY, []), current_user.to_dbref())
     else:
         result = add_activity(activity_data, current_user.to_dbref())
 
     if not result:
-        return make_response(jsonify({MESSAGE_KEY: 'Failed to create activity'}),
-                             HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Failed to create activity'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
-    return make_response(jsonify({MESSAGE_KEY: 'Success', ACTIVITY_ID_KEY: result}), HTTPStatus.CREATED)
+    return _json({MESSAGE_KEY: 'Success', ACTIVITY_ID_KEY: result}, HTTPStatus.CREATED)
 
 
 @bp.route('/activity', methods=['DELETE'])
@@ -624,21 +838,19 @@ def activity_delete():
             200:
                 description: Activity was deleted
     """
-    data = flask.request.json if flask.request.json else flask.request.form
+    data = _get_data()
     activity_id: str = data.get(ACTIVITY_ID_KEY)
 
     if not activity_id:
-        return make_response((jsonify({MESSAGE_KEY: 'Empty data'}, HTTPStatus.BAD_REQUEST)))
+        return _json({MESSAGE_KEY: 'Empty data'}, HTTPStatus.BAD_REQUEST)
 
     result = delete_activity(activity_id)
     if result == 0:
-        return make_response(jsonify({MESSAGE_KEY: 'Activity with this id was not found'}),
-                             HTTPStatus.NOT_FOUND)
+        return _json({MESSAGE_KEY: 'Activity with this id was not found'}, HTTPStatus.NOT_FOUND)
     if not result:
-        return make_response(jsonify({MESSAGE_KEY: 'Failed to delete activity'}),
-                             HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Failed to delete activity'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
-    return make_response(jsonify({MESSAGE_KEY: 'Success'}), HTTPStatus.OK)
+    return _json({MESSAGE_KEY: 'Success'}, HTTPStatus.OK)
 
 
 @bp.route('/activity', methods=['GET'])
@@ -676,55 +888,90 @@ def activity_find():
                 required: false
                 type: string
                 description: maximum end time of an activity
+            -   name: cursor
+                in: query
+                required: false
+                type: string
+                description: next_cursor of the previous page, used instead of offset
         responses:
             404:
                 description: Activities were not found
             400:
                 description: Wrong format
             200:
-                description: A list of activities was returned
-    """
-    data = flask.request.args
-    offset: int = int(data.get(OFFSET_KEY, 0))
-    amount_to_return: int = min(int(data.get(AMOUNT_TO_RETURN_KEY, 100)), 1000)
-    filters = data.get(FILTERS_KEY, {})
-    start_time = data.get(START_TIME_KEY, None)
-    end_time = data.get(END_TIME_KEY, None)
-
-    if not isinstance(filters, dict):
-        try:
-            filters = json.loads(filters)
-        except Exception:
-            return make_response(jsonify({MESSAGE_KEY: 'Wrong format'}), HTTPStatus.BAD_REQUEST)
-
-    activities = find_activities([current_user.id], offset=offset, items_to_return=amount_to_return,
-                                 filters=filters, start_time=start_time, end_time=end_time)
+                description: A list of activities was returned, latest first, with next_cursor
+    """
+    args, errors = _activity_query_schema.load(flask.request.args)
+    if errors:
+        return _json({MESSAGE_KEY: 'Wrong format'}, HTTPStatus.BAD_REQUEST)
+    offset: int = args[OFFSET_KEY]
+    amount_to_return: int = min(args[AMOUNT_TO_RETURN_KEY], 1000)
+    filters = args[FILTERS_KEY]
+    start_time = args[START_TIME_KEY]
+    end_time = args[END_TIME_KEY]
+    cursor = args[CURSOR_KEY]
+
+    #  One extra activity tells build_activities_page whether there is a next page
+    activities = find_activities([current_user.id], offset=offset, items_to_return=amount_to_return + 1,
+                                 filters=filters, start_time=start_time, end_time=end_time, cursor=cursor)
     if activities is None:
-        return make_response(jsonify({MESSAGE_KEY: 'Failed to fetch activities'}),
-                             HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _json({MESSAGE_KEY: 'Failed to fetch activities'}, HTTPStatus.INTERNAL_SERVER_ERROR)
     if activities == -1:
-        return make_response(jsonify({MESSAGE_KEY: 'Wrong format for filters'}),
-                             HTTPStatus.BAD_REQUEST)
+        return _json({MESSAGE_KEY: 'Wrong format for filters'}, HTTPStatus.BAD_REQUEST)
 
     if not activities:
-        return make_response(jsonify({MESSAGE_KEY: 'Activities of current user were not found'}),
-                             HTTPStatus.NOT_FOUND)
-    activities_list = [{k: str(v) for k, v in activity.to_mongo().items()} for activity in activities]
+        return _json({MESSAGE_KEY: 'Activities of current user were not found'}, HTTPStatus.NOT_FOUND)
 
-    return make_response(jsonify({MESSAGE_KEY: 'Success', ACTIVITIES_KEY: activities_list}), HTTPStatus.OK)
+    return _json({MESSAGE_KEY: 'Success', **build_activities_page(activities, amount_to_return)}, HTTPStatus.OK)
 
 
-if __name__ == '__main__':
-    app.register_blueprint(bp, url_prefix=os.environ["FLASK_BASE_PATH"])
+app.register_blueprint(bp, url_prefix=os.environ.get("FLASK_BASE_PATH", ""))
 
-    # Save documentation
-    with open(os.path.join(INNOMETRICS_PATH, 'documentation.yaml'), 'w') as f:
-        f.write(spec.to_yaml())
 
-    if not INNOMETRICS_PRODUCTION:
-        app.run(host='0.0.0.0', port=os.environ['FLASK_PORT'], threaded=True)
-    else:
-        server = WSGIServer(('0.0.0.0', int(os.environ['FLASK_PORT'])), app,
-                            keyfile=INNOMETRICS_PRODUCTION_KEYFILE,
-                            certfile=INNOMETRICS_PRODUCTION_CERTFILE)
-        server.serve_forever()
+def build_spec():
+    """
+    Build OpenAPI documentation from the docstrings of the views
+    :return: APISpec instance
+    """
+    #  apispec and marshmallow are only needed to dump the docs, keep them out of the workers' startup
+    from apispec import APISpec
+    from apispec.ext.flask import FlaskPlugin
+    from apispec.ext.marshmallow import MarshmallowPlugin
+
+    spec = APISpec(
+        title='Innometrics backend API',
+        version='1.0.0',
+        plugins=(
+            FlaskPlugin(),
+            MarshmallowPlugin(),
+        ),
+        consumes=['multipart/form-data', 'application/x-www-form-urlencoded']
+    )
+    with app.test_request_context():
+        for view in (login, user_register, new_project, invite, accept_invitation_endpoint, project_activities,
+                     user_delete, logout, activity_add, activity_delete, activity_find):
+            spec.add_path(view=view)
+    return spec
+
+
+def create_server() -> WSGIServer:
+    """
+    Create a gevent server for the app, the same in development and production
+    :return: WSGIServer instance, serving over TLS in production
+    """
+    ssl_args = {}
+    if INNOMETRICS_PRODUCTION:
+        ssl_args = {'keyfile': INNOMETRICS_PRODUCTION_KEYFILE, 'certfile': INNOMETRICS_PRODUCTION_CERTFILE}
+    #  Cap concurrent greenlets so a burst of slow bcrypt logins queues in the backlog instead of
+    #  exhausting memory, and keep a deep accept queue for such bursts
+    return WSGIServer(('0.0.0.0', int(os.environ['FLASK_PORT'])), app, spawn=Pool(SERVER_MAX_CONNECTIONS),
+                      backlog=SERVER_BACKLOG, **ssl_args)
+
+
+if __name__ == '__main__':
+    # Save documentation, normally done with scripts/generate_openapi.py
+    if os.environ.get('INNOMETRICS_WRITE_DOCS'):
+        with open(os.path.join(INNOMETRICS_PATH, 'documentation.yaml'), 'w') as f:
+            f.write(build_spec().to_yaml())
+
+    create_server().serve_forever()
@@ -0,0 +1,57 @@
+"""
+Find the bcrypt cost to use for BCRYPT_COST on this machine, run with `python -m api.bench_bcrypt`
+"""
+import argparse
+import time
+
+import bcrypt
+
+from api.conf import BCRYPT_COST
+
+MIN_COST = 4
+MAX_COST = 20
+DEFAULT_TARGET_MS = 250
+
+
+def measure_hashing_time(cost: int, repeat: int = 3) -> float:
+    """
+    Measure how long hashing a password takes
+    :param cost: a bcrypt cost
+    :param repeat: a number of measurements to take
+    :return: the fastest hashing time in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        salt = bcrypt.gensalt(rounds=cost)
+        start = time.perf_counter()
+        bcrypt.hashpw(b'benchmark-password', salt)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def find_cost(target_ms: float) -> int:
+    """
+    Binary search the highest cost hashing within the target time
+    :param target_ms: a maximum hashing time in milliseconds
+    :return: bcrypt cost, MIN_COST if even it is slower than the target
+    """
+    low, high = MIN_COST, MAX_COST
+    while low < high:
+        cost = (low + high + 1) // 2
+        timing = measure_hashing_time(cost)
+        print(f'cost {cost}: {timing:.1f} ms')
+        if timing <= target_ms:
+            low = cost
+        else:
+            high = cost - 1
+    return low
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                            help='maximum time a single hash may take')
+    args = arg_parser.parse_args()
+
+    cost = find_cost(args.target_ms)
+    print(f'Recommended BCRYPT_COST={cost}, currently {BCRYPT_COST}')
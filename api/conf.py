@@ -1 +1,14 @@
+import os
+
 CORS_URL = '*'
+
+#  bcrypt work factor, every step doubles hashing time (2^cost iterations of the key schedule).
+#  Benchmark on the target hardware and pick the smallest value meeting the security target.
+BCRYPT_COST = int(os.environ.get('BCRYPT_COST', 12))
+
+#  Remember successful password checks for a few minutes so repeated logins skip bcrypt
+VERIFY_PASSWORD_CACHE = bool(os.environ.get('INNOMETRICS_VERIFY_PASSWORD_CACHE'))
+
+#  Limits of the gevent server, per worker under gunicorn
+SERVER_MAX_CONNECTIONS = int(os.environ.get('SERVER_MAX_CONNECTIONS', 1024))
+SERVER_BACKLOG = int(os.environ.get('SERVER_BACKLOG', 2048))
@@ -5,14 +5,10 @@ import os
 
 MESSAGE_KEY = 'message'
 INNOMETRICS_PATH = os.environ.get('INNOMETRICS_BACKEND_PATH')
-try:
-    INNOMETRICS_PRODUCTION = os.environ.get('INNOMETRICS_BACKEND_PRODUCTION')
-    if INNOMETRICS_PRODUCTION:
-        INNOMETRICS_PRODUCTION = True
-        INNOMETRICS_PRODUCTION_KEYFILE = os.environ.get('INNOMETRICS_BACKEND_PRODUCTION_KEYFILE')
-        INNOMETRICS_PRODUCTION_CERTFILE = os.environ.get('INNOMETRICS_BACKEND_PRODUCTION_CERTFILE')
-except:
-    INNOMETRICS_PRODUCTION = False
+INNOMETRICS_PRODUCTION = bool(os.environ.get('INNOMETRICS_BACKEND_PRODUCTION'))
+#  Always defined so importing the constants never depends on the environment
+INNOMETRICS_PRODUCTION_KEYFILE = os.environ.get('INNOMETRICS_BACKEND_PRODUCTION_KEYFILE')
+INNOMETRICS_PRODUCTION_CERTFILE = os.environ.get('INNOMETRICS_BACKEND_PRODUCTION_CERTFILE')
 
 EMAIL_KEY = 'email'
 PASSWORD_KEY = 'password'
@@ -36,7 +32,10 @@ USER_KEY = 'user'
 AMOUNT_TO_RETURN_KEY = 'amount_to_return'
 OFFSET_KEY = 'offset'
 FILTERS_KEY = 'filters'
+CURSOR_KEY = 'cursor'
+NEXT_CURSOR_KEY = 'next_cursor'
 TOKEN_KEY = 'token'
+AUTH_TOKEN_PREFIX = 'Token '
 PROJECT_KEY = 'project'
 USER_EMAIL_KEY = 'user_email'
 MANAGER_KEY = 'manager'
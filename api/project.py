@@ -1,8 +1,9 @@
-from typing import Optional, Union, List
+from typing import Optional, Union, List, Dict
 
 from api.activity import find_activities
-from db.models import Project, User, Activity
+from db.models import Project, User
 from logger import logger
+from utils import normalize_email
 
 
 def create_new_project(name: str, creator: str) -> Optional[str]:
@@ -44,7 +45,7 @@ def invite_user(project_id: str, user_email: str, invitor: str, manager: bool =
     if invitor not in project.managers:
         return None
 
-    user = User.objects(email=user_email).first()
+    user = User.objects(email=normalize_email(user_email)).first()
     if not user:
         return None
 
@@ -87,7 +88,7 @@ def accept_invitation(project_id: str, user: str) -> Optional[bool]:
     return user_indeed_was_invited
 
 
-def get_project_activities(project_id: str, user: str, **filters) -> Union[int, None, List[Activity]]:
+def get_project_activities(project_id: str, user: str, **filters) -> Union[int, None, List[Dict]]:
     """
     Return activities of all users in a project
     :param project_id: an id of the project
@@ -98,7 +99,8 @@ def get_project_activities(project_id: str, user: str, **filters) -> Union[int,
     if not (project_id or user):
         return None
 
-    project = Project.objects(id=project_id).first()
+    #  Only references are needed, skip loading the member documents
+    project = Project.objects(id=project_id).only('managers', 'users').no_dereference().first()
     if not project:
         return None
 
@@ -0,0 +1,63 @@
+"""
+Schemas for request parameters
+"""
+import orjson
+from marshmallow import Schema, fields
+from marshmallow.validate import Range
+
+from api.activity import decode_cursor, parse_time
+
+
+class JSONDict(fields.Dict):
+    """
+    Dict field which also accepts a JSON encoded object, as sent in query strings
+    """
+
+    def _deserialize(self, value, attr, data):
+        if isinstance(value, (str, bytes)):
+            try:
+                value = orjson.loads(value)
+            except orjson.JSONDecodeError:
+                self.fail('invalid')
+        return super()._deserialize(value, attr, data)
+
+
+class ClientDateTime(fields.Field):
+    """
+    Datetime accepting the same formats as stored activities, see api.activity.parse_time. An empty value
+    means no datetime.
+    """
+    default_error_messages = {'invalid': 'Not a valid datetime.'}
+
+    def _deserialize(self, value, attr, data):
+        if value == '':
+            return None
+        parsed = parse_time(value) if isinstance(value, str) else None
+        if parsed is None:
+            self.fail('invalid')
+        return parsed
+
+
+class Cursor(fields.Field):
+    """
+    Pagination cursor made by api.activity.encode_cursor, deserialized to a start time and an activity id
+    """
+    default_error_messages = {'invalid': 'Not a valid cursor.'}
+
+    def _deserialize(self, value, attr, data):
+        cursor = decode_cursor(value) if isinstance(value, str) else None
+        if cursor is None:
+            self.fail('invalid')
+        return cursor
+
+
+class ActivityQuerySchema(Schema):
+    """
+    Query parameters of activity listing endpoints
+    """
+    offset = fields.Int(missing=0, validate=Range(min=0))
+    amount_to_return = fields.Int(missing=100, validate=Range(min=1))
+    filters = JSONDict(missing=dict)
+    start_time = ClientDateTime(missing=None)
+    end_time = ClientDateTime(missing=None)
+    cursor = Cursor(missing=None)
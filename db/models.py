@@ -2,18 +2,27 @@
 DB models for Mongo
 """
 from flask_login import UserMixin
-from mongoengine import StringField, ListField, ReferenceField, DateTimeField, BooleanField, Document, connect
+from mongoengine import StringField, ListField, ReferenceField, DateTimeField, BooleanField, BinaryField, IntField, \
+    Document, connect
 
 import os
 
+from utils import normalize_email
+
 DEFAULT_STRING_MAX_LENGTH = 10000
+MONGO_MAX_POOL_SIZE = 100
+MONGO_MIN_POOL_SIZE = 10
+MONGO_SOCKET_TIMEOUT_MS = 5000
 
 connect(
     os.environ['MONGO_DB'],
     host = os.environ['MONGO_HOST'],
     username = os.environ['MONGO_USER'],
     password = os.environ['MONGO_PASSWORD'],
-    authentication_source = "admin"
+    authentication_source = "admin",
+    maxPoolSize = MONGO_MAX_POOL_SIZE,
+    minPoolSize = MONGO_MIN_POOL_SIZE,
+    socketTimeoutMS = MONGO_SOCKET_TIMEOUT_MS
 )
 
 
@@ -23,14 +32,20 @@ class Role(Document):
 
 
 class User(Document, UserMixin):
-    email = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
-    password = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
+    email = StringField(max_length=DEFAULT_STRING_MAX_LENGTH, unique=True)
+    password = BinaryField()
+    #  Users stored before the field was added hash the raw password
+    password_hash_version = IntField(default=1)
     name = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
     surname = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
     active = BooleanField(default=True)
     confirmed_at = DateTimeField()
     roles = ListField(ReferenceField(Role), default=[])
 
+    def clean(self):
+        if self.email:
+            self.email = normalize_email(self.email)
+
 
 class Project(Document):
     name = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
@@ -52,3 +67,10 @@ class Activity(Document):
     ip_address = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
     mac_address = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
     value = StringField(max_length=DEFAULT_STRING_MAX_LENGTH)
+
+    meta = {
+        'indexes': [
+            ('user', '-start_time', '-id'),
+            ('user', 'activity_type', '-start_time', '-id'),
+        ]
+    }
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for serving the API, run with `gunicorn api.app:app`
+"""
+import multiprocessing
+import os
+import sys
+
+#  The gunicorn script does not put the working directory on the import path before reading this file
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.conf import SERVER_MAX_CONNECTIONS, SERVER_BACKLOG
+from api.constants import INNOMETRICS_PRODUCTION, INNOMETRICS_PRODUCTION_KEYFILE, INNOMETRICS_PRODUCTION_CERTFILE
+
+bind = f"0.0.0.0:{os.environ['FLASK_PORT']}"
+
+#  Requests mostly wait on MongoDB and bcrypt (which releases the GIL), so every worker
+#  multiplexes many connections on gevent and workers scale with cores
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gevent'
+#  Same limits as create_server in api/app.py
+worker_connections = SERVER_MAX_CONNECTIONS
+backlog = SERVER_BACKLOG
+keepalive = 30
+
+#  TLS only in production, as in create_server
+if INNOMETRICS_PRODUCTION:
+    keyfile = INNOMETRICS_PRODUCTION_KEYFILE
+    certfile = INNOMETRICS_PRODUCTION_CERTFILE
@@ -0,0 +1,11 @@
+"""
+Generate REST API documentation from the docstrings of the views into documentation.yaml
+"""
+import os
+
+from api.app import build_spec
+from api.constants import INNOMETRICS_PATH
+
+if __name__ == '__main__':
+    with open(os.path.join(INNOMETRICS_PATH, 'documentation.yaml'), 'w') as f:
+        f.write(build_spec().to_yaml())
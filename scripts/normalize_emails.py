@@ -0,0 +1,40 @@
+"""
+One-time migration bringing emails of existing users to the normalized form
+used for lookups since login stopped falling back to a case-sensitive query
+"""
+from collections import defaultdict
+
+from db.models import User
+from logger import logger
+from utils import normalize_email
+
+
+def normalize_emails() -> int:
+    """
+    Normalize emails of all users, users whose emails collide after normalization are left as is
+    :return: an amount of updated users
+    """
+    collection = User._get_collection()
+    users_by_email = defaultdict(list)
+    for document in collection.find({}, {'email': 1}):
+        email = document.get('email')
+        if email:
+            users_by_email[normalize_email(email)].append(document)
+
+    updated = 0
+    for email, documents in users_by_email.items():
+        if len(documents) > 1:
+            user_ids = ', '.join(str(document['_id']) for document in documents)
+            logger.error(f'Users {user_ids} share email {email} after normalization, resolve manually')
+            continue
+
+        document = documents[0]
+        if document['email'] != email:
+            collection.update_one({'_id': document['_id']}, {'$set': {'email': email}})
+            updated += 1
+
+    return updated
+
+
+if __name__ == '__main__':
+    logger.info(f'Normalized emails of {normalize_emails()} users')